@@ -1,8 +1,12 @@
 ﻿import os
 import hmac
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+import httpx
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Depends, HTTPException, status
-from fastapi.security import APIKeyHeader
+from fastapi import FastAPI, Depends, Request, status
+from fastapi.openapi.utils import get_openapi
+from fastapi.responses import ORJSONResponse
+from starlette._utils import get_route_path
 from dotenv import load_dotenv
 
 # 전역 리밋(만일의 사태 대비)용
@@ -21,20 +25,24 @@ if not API_KEYS:
     # 필수 키 누락 시 명확한 실패(부팅 실패로 빠르게 드러냄)
     raise RuntimeError("API_KEYS is required but missing")
 
-# 2) 헤더 기반 API 키 인증 (X-API-Key)
-API_KEY_HEADER = APIKeyHeader(name="X-API-Key", auto_error=False)
+# 2) 헤더 기반 API 키 인증 (X-API-Key) — 의존성 대신 미들웨어에서 검사
+API_KEY_HEADER = "X-API-Key"
 
+# 한 번 검증에 성공한 키 캐시(API_KEYS의 부분집합이므로 크기 상한이 자연히 보장됨)
+_ACCEPTED: set[str] = set()
 
-def verify_api_key(x_api_key: str | None = Depends(API_KEY_HEADER)):
+
+def is_valid_api_key(x_api_key: str | None) -> bool:
     if not x_api_key:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized"
-        )
-    # 상수시간 비교로 안전한 비교
+        return False
+    if x_api_key in _ACCEPTED:
+        return True
+    # 상수시간 비교로 안전한 비교(캐시 미스 시에만)
     for k in API_KEYS:
         if hmac.compare_digest(x_api_key, k):
+            _ACCEPTED.add(x_api_key)
             return True
-    raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
+    return False
 
 
 # 2.5) 전역 얇은 리밋(만일의 사태 대비) 설정값 — 60초 동안 최대 50회가 기본
@@ -48,11 +56,23 @@ async def lifespan(app: FastAPI):
     redis_url = os.getenv("REDIS_URL")
     redis = from_url(redis_url, encoding="utf-8", decode_responses=True)
     await FastAPILimiter.init(redis)  # 전역 리미터 초기화
+    app.state.redis = redis  # 추출 결과 캐시에도 재사용
+    # 프로세스 전역 HTTP 클라이언트(커넥션 풀/keep-alive 재사용)
+    app.state.http = httpx.AsyncClient(
+        timeout=httpx.Timeout(timeout=10.0, connect=5.0, read=8.0, write=8.0, pool=5.0),
+        headers={"User-Agent": "news-extract-api/1.0"},
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        http2=True,
+        # 요청 간 쿠키 공유 방지(모든 쿠키 거부 → 매 요청이 빈 쿠키 상태로 시작)
+        cookies=CookieJar(policy=DefaultCookiePolicy(allowed_domains=[])),
+    )
     yield
+    await app.state.http.aclose()
     await FastAPILimiter.close()
 
 
-app = FastAPI(lifespan=lifespan)
+# 실행: uvicorn app.main:app --loop uvloop --http httptools --workers N
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
 
 
 @app.get("/")
@@ -65,11 +85,45 @@ def health():
     return {"ok": True}
 
 
-# 4) 추출 라우터 전체 보호: 인증 + 전역 얇은 리밋
+# 4) 추출 라우터 전체 보호: 인증(미들웨어) + 전역 얇은 리밋(의존성)
+PROTECTED_PREFIX = extract_router.prefix + "/"  # "/v1foo" 같은 경로는 제외
+
+
+@app.middleware("http")
+async def auth_mw(request: Request, call_next):
+    # root_path(프록시 프리픽스)를 뗀 라우팅 기준 경로로 판단해야 우회되지 않음
+    route_path = get_route_path(request.scope)
+    if route_path.startswith(PROTECTED_PREFIX) and not is_valid_api_key(
+        request.headers.get(API_KEY_HEADER)
+    ):
+        return ORJSONResponse(
+            {"detail": "Unauthorized"}, status_code=status.HTTP_401_UNAUTHORIZED
+        )
+    return await call_next(request)
+
+
 app.include_router(
     extract_router,
     dependencies=[
-        Depends(verify_api_key),
         Depends(RateLimiter(times=GLOBAL_LIMIT_TIMES, seconds=GLOBAL_LIMIT_SECONDS)),
     ],
 )
+
+
+# 5) OpenAPI에 API 키 보안 스킴 노출(/docs에서 X-API-Key 입력) — 요청당 의존성 없이 스키마만 보강
+def custom_openapi():
+    if app.openapi_schema:
+        return app.openapi_schema
+    schema = get_openapi(title=app.title, version=app.version, routes=app.routes)
+    schema.setdefault("components", {})["securitySchemes"] = {
+        "APIKeyHeader": {"type": "apiKey", "in": "header", "name": API_KEY_HEADER}
+    }
+    for path, operations in schema["paths"].items():
+        if path.startswith(PROTECTED_PREFIX):
+            for operation in operations.values():
+                operation["security"] = [{"APIKeyHeader": []}]
+    app.openapi_schema = schema
+    return schema
+
+
+app.openapi = custom_openapi
@@ -1,9 +1,18 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 from pydantic import BaseModel, HttpUrl
+import anyio
+import codecs
+import hashlib
 import httpx
+import msgpack
+import orjson
+import os
 import re
+import re2
 import yaml
+from selectolax.parser import HTMLParser
 from trafilatura import extract, extract_metadata
+from trafilatura.utils import load_html
 
 router = APIRouter(prefix="/v1", tags=["extract"])
 
@@ -23,9 +32,33 @@ class ExtractOut(BaseModel):
 
 def normalize_newlines(text: str) -> str:
     # 개행/탭 정규화: CRLF/CR -> LF, 탭 -> 공백
+    # (str.replace는 memchr 기반이라 비ASCII 본문에서 dict 테이블 translate보다 훨씬 빠름)
     return text.replace("\r\n", "\n").replace("\r", "\n").replace("\t", " ")
 
 
+try:
+    from yaml import CSafeLoader as _YamlLoader  # libyaml C 바인딩
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+# trafilatura 프런트매터는 평평한 "key: value" 라인들로만 구성됨
+_RE_FM_LINE = re.compile(r"^[A-Za-z_][\w\-]*:\s*.*$")
+
+
+def parse_front_matter_block(fm_block: str) -> dict:
+    # 모든 라인이 단순 key: value면 YAML 파서 없이 직접 분리
+    lines = [line for line in fm_block.splitlines() if line.strip()]
+    if all(_RE_FM_LINE.match(line) for line in lines):
+        fm = {}
+        for line in lines:
+            key, value = line.split(":", 1)
+            fm[key] = value.strip()
+        return fm
+    # 중첩/혼합 구조일 때만 YAML 로더로 폴백
+    fm = yaml.load(fm_block, Loader=_YamlLoader)
+    return fm if isinstance(fm, dict) else {}
+
+
 def strip_and_parse_front_matter(text: str) -> tuple[str, dict]:
     # 선두 YAML 프런트매터를 메타로 파싱해 반환(본문에서는 제거)
     if text.startswith("---"):
@@ -33,7 +66,7 @@ def strip_and_parse_front_matter(text: str) -> tuple[str, dict]:
         if len(parts) == 2:
             fm_block = parts[0].lstrip("-\n")
             try:
-                fm = yaml.safe_load(fm_block) or {}
+                fm = parse_front_matter_block(fm_block)
             except Exception:
                 fm = {}
             return parts[1], fm
@@ -51,54 +84,296 @@ SAFE_NOISE_PATTERNS = [
     r"^\s*\S+@\S+\s*$",  # 이메일만 있는 단독 라인
     r"^\s*\[?\s*\S+@\S+\s*\]?\s*\(\s*mailto\s*:\s*\S+@\S+\s*\)\s*$",  # [email](mailto:email)
     r"^\s*.+?\s+\[?\s*\S+@\S+\s*\]?\s*\(\s*mailto\s*:\s*\S+@\S+\s*\)\s*$",  # 브랜드 + mailto
-    r"^\s*[\w\-\.\u3131-\u318E\uAC00-\uD7A3 ]+\s+\S+@\S+\s*$",  # 브랜드 + 이메일(평문)
+    r"^\s*[\w\-\.ㄱ-ㆎ가-힣 ]+\s+\S+@\S+\s*$",  # 브랜드 + 이메일(평문)
 ]
-SAFE_REGEXES = [re.compile(p, re.IGNORECASE) for p in SAFE_NOISE_PATTERNS]
+
+
+def _re2_ci_options():
+    # RE2 대소문자 무시 옵션(re.IGNORECASE 대응)
+    opts = re2.Options()
+    opts.case_sensitive = False
+    return opts
+
+
+# RE2의 \w/\s/\d는 ASCII 전용이므로 stdlib re(유니코드)와 같은 집합으로 풀어 씀
+_RE2_WORD = r"\pL\pN_"
+_RE2_SPACE = r"\t\n\v\f\r\x1c-\x1f\x85\p{Z}"
+_RE2_DIGIT = r"\p{Nd}"
+_RE2_CLASS_ESCAPES = {"w": _RE2_WORD, "s": _RE2_SPACE, "d": _RE2_DIGIT}
+
+
+def _to_re2(pattern: str) -> str:
+    # stdlib re 패턴의 문자 클래스 이스케이프를 유니코드 의미 그대로 RE2 문법으로 변환
+    # (\b 등 동일 의미로 옮길 수 없는 이스케이프는 ValueError → stdlib re 폴백)
+    out = []
+    in_class = False
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "\\":
+            esc = pattern[i + 1 : i + 2]
+            i += 2
+            if esc in _RE2_CLASS_ESCAPES:
+                body = _RE2_CLASS_ESCAPES[esc]
+                out.append(body if in_class else f"[{body}]")
+            elif esc.lower() in _RE2_CLASS_ESCAPES and not in_class:
+                out.append(f"[^{_RE2_CLASS_ESCAPES[esc.lower()]}]")
+            elif esc.isalpha() and esc not in "tnvfrx":
+                raise ValueError(f"no RE2 equivalent for \\{esc}")
+            else:
+                out.append(c + esc)
+            continue
+        if c == "[" and not in_class:
+            in_class = True
+        elif c == "]" and in_class:
+            in_class = False
+        out.append(c)
+        i += 1
+    return "".join(out)
+
+
+def _build_safe_union():
+    # RE2(선형 시간, 백트래킹 없음)로 컴파일하고, RE2가 거부하는 패턴만 stdlib re로 폴백
+    opts = _re2_ci_options()
+    accepted, rejected = [], []
+    for p in SAFE_NOISE_PATTERNS:
+        try:
+            converted = _to_re2(p)
+            re2.compile(converted, opts)
+            accepted.append(converted)
+        except (ValueError, re2.error):
+            rejected.append(p)
+    union = (
+        re2.compile("|".join(f"(?:{p})" for p in accepted), opts) if accepted else None
+    )
+    fallback = (
+        re.compile("|".join(f"(?:{p})" for p in rejected), re.IGNORECASE)
+        if rejected
+        else None
+    )
+    return union, fallback
+
+
+# 패턴별 순회 대신 단일 alternation으로 묶어 라인당 match 1회로 판단
+_SAFE_UNION, _SAFE_FALLBACK = _build_safe_union()
+
+
+def _is_safe_noise(line: str) -> bool:
+    if _SAFE_UNION and _SAFE_UNION.match(line):
+        return True
+    return bool(_SAFE_FALLBACK and _SAFE_FALLBACK.match(line))
+
+
+# 공백/개행 축소용 정규식(모듈 로드 시 1회 컴파일)
+_RE_MULTI_BLANK = re.compile(r"\n{3,}")
+_RE_SPACE_NL = re.compile(r"\s*\n\s*")
+_RE_MULTI_SPACE = re.compile(r"\s{2,}")
+
+
+def _may_be_noise(s: str) -> bool:
+    # 모든 패턴은 '@' / '무단' / 'reserved' 중 하나를 포함하므로,
+    # 셋 다 없으면 정규식 없이 노이즈가 아님을 확정
+    return "@" in s or "무단" in s or "reserved" in s.lower()
+
+
+# 본문 전체 검사용: 본문 크기의 lower() 사본을 만들지 않고 대소문자 무시 검색
+_RESERVED_CI = re2.compile("reserved", _re2_ci_options())
+
+
+def _text_may_have_noise(text: str) -> bool:
+    return "@" in text or "무단" in text or _RESERVED_CI.search(text) is not None
 
 
 def remove_noise_lines_safe_only(text: str) -> str:
     text = normalize_newlines(text)
-    cleaned_lines = []
-    for raw in text.splitlines():
-        line = raw.rstrip()
-        # 초장문 라인은 정규식 판단에서 제외(성능 안정)
-        if len(line) > 5000:
-            cleaned_lines.append(line)
-            continue
-        if any(rx.match(line) for rx in SAFE_REGEXES):
-            continue
-        cleaned_lines.append(line)
+    cleaned_lines = [raw.rstrip() for raw in text.splitlines()]
+    # 본문 전체에 후보 리터럴이 없으면(흔한 경우) 라인별 판단 자체를 생략
+    if _text_may_have_noise(text):
+        cleaned_lines = [
+            line
+            for line in cleaned_lines
+            # 초장문 라인은 정규식 판단에서 제외(성능 안정)
+            if len(line) > 5000
+            or not _may_be_noise(line)
+            or not _is_safe_noise(line)
+        ]
     cleaned = "\n".join(cleaned_lines)
     # 과도한 빈 줄 축소
-    cleaned = re.sub(r"\n{3,}", "\n\n", cleaned)
+    cleaned = _RE_MULTI_BLANK.sub("\n\n", cleaned)
     return cleaned
 
 
 def collapse_newlines_to_spaces(s: str) -> str:
     # 여러 줄바꿈/공백을 단일 공백으로 축소(표시/전송용)
-    s = re.sub(r"\s*\n\s*", " ", s)
-    s = re.sub(r"\s{2,}", " ", s).strip()
+    s = _RE_SPACE_NL.sub(" ", s)
+    s = _RE_MULTI_SPACE.sub(" ", s).strip()
     return s
 
 
-@router.post("/extract", response_model=ExtractOut)
+# 다운로드 허용 본문 상한(바이트) — 초과 시 413
+MAX_HTML_BYTES = int(os.getenv("MAX_HTML_BYTES", str(5 * 1024 * 1024)))
+
+
+async def _fetch_body(client: httpx.AsyncClient, url: str) -> tuple[bytearray, str]:
+    # 스트리밍으로 받으며 Content-Type/크기를 먼저 확인해 비HTML·초대형 응답은 조기 거절
+    async with client.stream("GET", url) as resp:
+        resp.raise_for_status()
+        ctype = resp.headers.get("content-type", "").lower()
+        if ctype and "html" not in ctype and "xml" not in ctype:
+            raise HTTPException(status_code=415, detail="unsupported content-type")
+        clen = resp.headers.get("content-length", "")
+        if clen.isdigit() and int(clen) > MAX_HTML_BYTES:
+            raise HTTPException(status_code=413, detail="content too large")
+        buf = bytearray()
+        async for chunk in resp.aiter_bytes():
+            buf += chunk
+            if len(buf) > MAX_HTML_BYTES:
+                raise HTTPException(status_code=413, detail="content too large")
+        # 인코딩 추정(휴리스틱) 없이 헤더 charset(없거나 모르는 값이면 UTF-8)으로 1회 디코딩
+        enc = resp.charset_encoding or "utf-8"
+        try:
+            codecs.lookup(enc)
+        except LookupError:
+            enc = "utf-8"
+        return buf, enc
+
+
+# 추출 결과 캐시 TTL(초) — 같은 URL/같은 HTML이면 추출을 건너뜀
+EXTRACT_CACHE_TTL = int(os.getenv("EXTRACT_CACHE_TTL", "3600"))
+
+
+def _cache_key(url: str, raw: bytes, enc: str, trim_newlines: bool) -> str:
+    # 결과는 (URL, 원본 바이트+charset, 줄바꿈 옵션)의 순수 함수이므로 모두 키에 반영
+    h = hashlib.blake2b(digest_size=16)
+    h.update(url.encode("utf-8"))
+    h.update(b"\0")
+    h.update(enc.encode("ascii", "ignore"))
+    h.update(b"\0")
+    h.update(raw)
+    return f"nx:{int(trim_newlines)}:{h.hexdigest()}"
+
+
+def _has_body_text(html: str) -> bool:
+    # lexbor(selectolax) 기반 사전 판별: <body>에 텍스트가 없으면 추출할 것도 없음
+    body = HTMLParser(html).body
+    return body is not None and bool(body.text(strip=True))
+
+
+def _worth_fallback(html: str) -> bool:
+    # 너무 짧거나 마크업이 없으면 폴백해도 결과가 없음
+    return len(html) >= 512 and "<" in html
+
+
+# 본문 추출(CPU 바운드) 전용 스레드 동시 실행 상한
+# (기본 리미터는 sync 엔드포인트와 공유되므로 건드리지 않음 — /health 지연 방지)
+PARSE_THREADS = int(os.getenv("PARSE_THREADS", "8"))
+_PARSE_LIMITER = anyio.CapacityLimiter(PARSE_THREADS)
+
+
+def _parse(html: str, url: str) -> tuple[str | None, dict]:
+    # CPU 바운드(HTML 파싱/DOM 정리) 구간: 워커 스레드에서 실행
+    # HTML은 한 번만 파싱해 extract/extract_metadata가 같은 트리를 공유
+    # (trafilatura는 정리 단계에서 트리 사본을 쓰므로 원본 트리는 보존됨)
+    if not _has_body_text(html):
+        return None, {}
+    tree = load_html(html)
+    if tree is None:
+        return None, {}
+    text = extract(
+        tree,
+        include_comments=False,
+        include_tables=False,
+        fast=True,
+        with_metadata=True,
+    )
+    if not text:
+        # 느린 폴백(전체 가지치기)은 본문이 있을 법한 문서에서만 시도
+        if not _worth_fallback(html):
+            return None, {}
+        text = extract(tree, fast=False, with_metadata=True)
+        if not text:
+            return None, {}
+
+    # HTML 메타 추출(OG/구조화 데이터 기반)
+    meta_doc = extract_metadata(tree, default_url=url)
+    md = meta_doc.as_dict() if meta_doc and hasattr(meta_doc, "as_dict") else {}
+    return text, md
+
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_MEDIA_TYPES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack")
+
+
+def _parse_accept(accept: str) -> list[tuple[str, float]]:
+    # "type/subtype;q=0.5, ..." → [(media_range, q), ...]
+    ranges = []
+    for part in accept.split(","):
+        media, *params = part.split(";")
+        media = media.strip().lower()
+        if not media:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        ranges.append((media, q))
+    return ranges
+
+
+def negotiate_msgpack(accept: str) -> str | None:
+    # msgpack이 명시적으로(q>0) 요청되고 JSON보다 선호될 때만 해당 MIME 반환
+    # 동률이면 명시된 타입 우선: application/json과 동률이면 JSON, 와일드카드와 동률이면 msgpack
+    ranges = _parse_accept(accept)
+    packs = [(q, m) for m, q in ranges if m in MSGPACK_MEDIA_TYPES and q > 0]
+    if not packs:
+        return None
+    pack_q, pack_type = max(packs)
+    # JSON의 q는 가장 구체적인 매칭(application/json > application/* > */*)을 따름
+    json_q, json_explicit = 0.0, False
+    for candidate in ("application/json", "application/*", "*/*"):
+        qs = [q for m, q in ranges if m == candidate]
+        if qs:
+            json_q, json_explicit = max(qs), candidate == "application/json"
+            break
+    if pack_q > json_q or (pack_q == json_q and not json_explicit):
+        return pack_type
+    return None
+
+
+def _render(request: Request, response: Response, data: dict):
+    # Accept 협상 결과가 msgpack이면 msgpack으로(이스케이프 없음), 아니면 기본 JSON 응답
+    media_type = negotiate_msgpack(request.headers.get("accept", ""))
+    if media_type is None:
+        response.headers["Vary"] = "Accept"
+        return data
+    body = ExtractOut.model_validate(data).model_dump(mode="json")
+    return Response(
+        content=msgpack.packb(body, use_bin_type=True),
+        media_type=media_type,
+        headers={"Vary": "Accept"},
+    )
+
+
+@router.post(
+    "/extract",
+    response_model=ExtractOut,
+    responses={200: {"content": {t: {} for t in MSGPACK_MEDIA_TYPES}}},
+)
 async def extract_endpoint(
+    request: Request,
+    response: Response,
     payload: ExtractIn,
     trim_newlines: bool = Query(
         False, description="True면 줄바꿈을 공백으로 치환해 반환"
     ),
 ):
-    # 1) 다운로드
+    # 1) 다운로드(lifespan에서 만든 공유 클라이언트 사용)
     try:
-        async with httpx.AsyncClient(
-            timeout=httpx.Timeout(
-                timeout=10.0, connect=5.0, read=8.0, write=8.0, pool=5.0
-            ),
-            headers={"User-Agent": "news-extract-api/1.0"},
-        ) as client:
-            resp = await client.get(str(payload.url))
-            resp.raise_for_status()
-            html = resp.text
+        raw, enc = await _fetch_body(request.app.state.http, str(payload.url))
     except httpx.HTTPStatusError as e:
         raise HTTPException(status_code=e.response.status_code, detail="upstream error")
     except httpx.RequestError:
@@ -106,18 +381,23 @@ async def extract_endpoint(
             status_code=504, detail="timeout or connection error to source"
         )
 
-    # 2) 본문 추출
-    text = extract(
-        html,
-        include_comments=False,
-        include_tables=False,
-        fast=True,
-        with_metadata=True,
+    # 1.5) 캐시 조회(lifespan에서 만든 Redis 재사용)
+    redis = request.app.state.redis
+    key = _cache_key(str(payload.url), raw, enc, trim_newlines)
+    cached = await redis.get(key)
+    if cached:
+        return _render(request, response, orjson.loads(cached))
+
+    # 1.6) 1회 디코딩 후 원본 바이트 즉시 해제(트리 생성 전 최대 메모리 절감)
+    html = raw.decode(enc, errors="replace")
+    del raw
+
+    # 2) 본문/메타 추출(이벤트 루프를 막지 않도록 스레드로 오프로드)
+    text, md = await anyio.to_thread.run_sync(
+        _parse, html, str(payload.url), limiter=_PARSE_LIMITER
     )
     if not text:
-        text = extract(html, fast=False, with_metadata=True)
-        if not text:
-            raise HTTPException(status_code=422, detail="no content extracted")
+        raise HTTPException(status_code=422, detail="no content extracted")
 
     # 3) 프런트매터 제거 및 메타 보강용 파싱
     text, fm = strip_and_parse_front_matter(text)
@@ -128,16 +408,13 @@ async def extract_endpoint(
     # 5) 줄바꿈 정책: 기본 유지(모델 입력 품질), 옵션으로 공백 치환
     final_text = collapse_newlines_to_spaces(text) if trim_newlines else text
 
-    # 6) HTML 메타 추출(OG/구조화 데이터 기반)
-    meta_doc = extract_metadata(html, default_url=str(payload.url))
-    md = meta_doc.as_dict() if meta_doc and hasattr(meta_doc, "as_dict") else {}
-
+    # 6) 메타 병합
     title = md.get("title")
     published_at = md.get("date") or fm.get("date") or fm.get("published_at")
     site = md.get("sitename") or fm.get("site") or md.get("hostname")
 
-    # 7) 최종 응답
-    return {
+    # 7) 최종 응답(캐시 저장 후 반환)
+    result = {
         "title": title,
         "text": final_text,
         "meta": {
@@ -146,3 +423,5 @@ async def extract_endpoint(
             "site": site,
         },
     }
+    await redis.set(key, orjson.dumps(result), ex=EXTRACT_CACHE_TTL)
+    return _render(request, response, result)
@@ -0,0 +1,74 @@
+import re
+
+import pytest
+
+from app.routers.extract import (
+    SAFE_NOISE_PATTERNS,
+    _cache_key,
+    _is_safe_noise,
+    negotiate_msgpack,
+)
+
+# 기준: 패턴 원문을 stdlib re(유니코드 \w/\s)로 묶은 alternation
+_RE_UNION = re.compile(
+    "|".join(f"(?:{p})" for p in SAFE_NOISE_PATTERNS), re.IGNORECASE
+)
+
+LINES = [
+    # 비ASCII 바이라인(RE2 ASCII \w로는 놓치던 사례)
+    "東亞日報 desk@donga.com",
+    "José Pérez jose@x.com",
+    "Ñandú News news@x.com",
+    "無断転載 x@y.com",
+    "Иван Петров ivan@x.ru",
+    "연합뉴스 desk@yna.co.kr",
+    "홍길동 기자 hong@x.com",
+    "東亞日報　desk@donga.com",
+    "Foo News news@x.com",
+    "[a@b.c](mailto:a@b.c)",
+    "매일경제 [a@b.c](mailto:a@b.c)",
+    "문의: q@w.e",
+    "무단전재·재배포 금지.",
+    "ALL RIGHTS RESERVED",
+    "Copyright 2024 Foo. All rights reserved",
+    "Copyrighté 2024 Foo. All rights reserved",
+    # 유지돼야 하는 본문 라인
+    "email me at x@y.com please",
+    "평범한 본문 문장입니다.",
+    "José Pérez escribió ayer",
+]
+
+
+@pytest.mark.parametrize("line", LINES)
+def test_safe_noise_matches_stdlib_re(line):
+    assert _is_safe_noise(line) == bool(_RE_UNION.match(line))
+
+
+@pytest.mark.parametrize(
+    "accept, expected",
+    [
+        ("", None),
+        ("application/json", None),
+        ("application/msgpack", "application/msgpack"),
+        ("application/x-msgpack", "application/x-msgpack"),
+        ("application/msgpack;q=0", None),
+        ("application/json, application/msgpack", None),
+        ("application/json;q=0.5, application/msgpack", "application/msgpack"),
+        ("application/msgpack;q=0.5, */*", None),
+        ("application/msgpack, */*", "application/msgpack"),
+        ("application/msgpack, application/*", "application/msgpack"),
+        ("application/x-msgpack;q=0.8, */*;q=0.8", "application/x-msgpack"),
+        ("application/msgpack, */*;q=0.1", "application/msgpack"),
+        ("application/msgpack;q=0.5, application/*;q=0.9", None),
+    ],
+)
+def test_negotiate_msgpack(accept, expected):
+    assert negotiate_msgpack(accept) == expected
+
+
+def test_cache_key_depends_on_charset():
+    raw = "뉴스".encode("utf-8")
+    url = "http://example.com/a"
+    assert _cache_key(url, raw, "utf-8", False) != _cache_key(
+        url, raw, "euc-kr", False
+    )
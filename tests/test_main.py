@@ -0,0 +1,34 @@
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+os.environ.setdefault("API_KEYS", "test-key")
+
+from app.main import app  # noqa: E402
+
+
+@pytest.mark.parametrize("root_path", ["", "/api"])
+def test_extract_requires_api_key(root_path):
+    client = TestClient(app, root_path=root_path)
+    url = f"{root_path}/v1/extract"
+    body = {"url": "http://example.com"}
+    assert client.post(url, json=body).status_code == 401
+    resp = client.post(url, json=body, headers={"X-API-Key": "wrong"})
+    assert resp.status_code == 401
+
+
+@pytest.mark.parametrize("root_path", ["", "/api"])
+def test_health_is_public(root_path):
+    client = TestClient(app, root_path=root_path)
+    assert client.get(f"{root_path}/health").status_code == 200
+
+
+def test_openapi_declares_api_key_scheme():
+    schema = TestClient(app).get("/openapi.json").json()
+    assert schema["components"]["securitySchemes"]["APIKeyHeader"]["name"] == (
+        "X-API-Key"
+    )
+    assert schema["paths"]["/v1/extract"]["post"]["security"] == [
+        {"APIKeyHeader": []}
+    ]